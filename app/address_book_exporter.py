@@ -1,7 +1,36 @@
 import csv
-import json
 import os
-import codecs
+import re
+import warnings
+from urllib.parse import unquote, urlparse
+import pandas as pd
+from app.json_io import write_json
+
+# (JSON key, CSV column, needs cleaning)
+_FIELDS = (
+    ("full_name", "姓名", False),
+    ("last_name", "姓氏", False),
+    ("first_name", "名字", False),
+    ("office", "處", False),
+    ("company", "公司", False),
+    ("department", "部門", True),
+    ("title", "職稱", False),
+    ("fax", "傳真號碼", True),
+    ("business_fax", "商務傳真", True),
+    ("business_phone", "商務電話", True),
+    ("mobile", "行動電話", True),
+    ("company_id", "公司 ID", False),
+    ("extension", "帳戶", False),
+    ("email", "電子郵件地址", False),
+    ("display_name", "電子郵件顯示名稱", False),
+    ("category", "類別", False),
+)
+
+# Cell values treated as empty after stripping
+_EMPTY_VALUES = frozenset(("", "&nbsp;"))
+
+# filename / filename* parameter of a Content-Disposition header
+_FILENAME_RE = re.compile(r"filename\*?=(?:UTF-8'')?\"?([^\";]+)\"?", re.IGNORECASE)
 
 
 class AddressBookExporter:
@@ -32,7 +61,21 @@ class AddressBookExporter:
 
         # Navigate only if needed
         if not page.url.startswith(self.URL):
-            page.goto(self.URL, wait_until="networkidle")
+            page.goto(self.URL, wait_until="domcontentloaded")
+
+        # The download button is the only thing we need; don't wait for networkidle
+        page.wait_for_selector("#B_DOWNLOAD")
+
+        # A plain link can be fetched with the session cookies, skipping the
+        # browser download pipeline. Postback buttons fall back to clicking.
+        href = page.eval_on_selector(
+            "#B_DOWNLOAD",
+            "el => (el.tagName === 'A' && el.href && !el.href.startsWith('javascript:')) ? el.href : null",
+        )
+        if href:
+            csv_path = self._fetch_csv(href)
+            if csv_path:
+                return csv_path
 
         with page.expect_download() as download_info:
             page.click("#B_DOWNLOAD")
@@ -46,42 +89,68 @@ class AddressBookExporter:
         download.save_as(csv_path)
         return csv_path
 
+    def _fetch_csv(self, url):
+        """
+        GET the CSV through page.request; returns None if the response is not OK.
+        """
+        response = self.page.request.get(url)
+        if not response.ok:
+            return None
+
+        disposition = response.headers.get("content-disposition", "")
+        match = _FILENAME_RE.search(disposition)
+        filename = os.path.basename(unquote(match.group(1)) if match else urlparse(url).path)
+
+        csv_path = os.path.join(self.OUTPUT_DIR, filename or "address_book.csv")
+        with open(csv_path, "wb") as f:
+            f.write(response.body())
+        return csv_path
+
     # ------------------------
     # CSV (Big5) → JSON
     # ------------------------
     def _convert_csv_to_json(self, csv_path):
         json_path = os.path.join(self.OUTPUT_DIR, self.OUTPUT_JSON)
 
-        with codecs.open(csv_path, "r", encoding="big5", errors="ignore") as f:
-            reader = csv.DictReader(f)
-            data = []
-
-            for row in reader:
-                data.append({
-                    "full_name": row.get("姓名"),
-                    "last_name": row.get("姓氏"),
-                    "first_name": row.get("名字"),
-                    "office": row.get("處"),
-                    "company": row.get("公司"),
-                    "department": self._clean(row.get("部門")),
-                    "title": row.get("職稱"),
-                    "fax": self._clean(row.get("傳真號碼")),
-                    "business_fax": self._clean(row.get("商務傳真")),
-                    "business_phone": self._clean(row.get("商務電話")),
-                    "mobile": self._clean(row.get("行動電話")),
-                    "company_id": row.get("公司 ID"),
-                    "extension": row.get("帳戶"),
-                    "email": row.get("電子郵件地址"),
-                    "display_name": row.get("電子郵件顯示名稱"),
-                    "category": row.get("類別"),
-                })
-
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(csv_path, "r", encoding="big5", errors="ignore", newline="") as f:
+            header = next(csv.reader(f), None)
+
+        if not header:
+            # Empty download: no header, no rows
+            write_json(json_path, [])
+            return json_path
+
+        # Parse and clean with pandas instead of a per-row Python dict build.
+        # Kept in line with csv.DictReader:
+        #   - index_col=False: a trailing comma on every row doesn't become an index
+        #   - over-long rows drop their extra fields
+        #   - fields missing from a short row read as None; empty cells stay ""
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", pd.errors.ParserWarning)
+            df = pd.read_csv(
+                csv_path,
+                encoding="big5",
+                encoding_errors="ignore",
+                dtype=str,
+                keep_default_na=False,
+                na_values=[],
+                index_col=False,
+                engine="python",
+                on_bad_lines=lambda fields: fields[:len(header)],
+            )
+
+        # Columns absent from the header read as None, like row.get() did
+        df = df.reindex(columns=[column for _, column, _ in _FIELDS])
+        df = df.astype(object).where(df.notna(), None)
+
+        clean_columns = [column for _, column, needs_clean in _FIELDS if needs_clean]
+        stripped = df[clean_columns].apply(lambda s: s.str.strip())
+        df[clean_columns] = stripped.where(stripped.notna() & ~stripped.isin(_EMPTY_VALUES), None)
+
+        df.columns = [key for key, _, _ in _FIELDS]
+        data = df.to_dict(orient="records")
+
+        write_json(json_path, data)
 
         return json_path
-    
-    def _clean(self, value):
-        if not value or value.strip() in ("&nbsp;", ""):
-            return None
-        return value.strip()
+
@@ -2,7 +2,7 @@ import os
 import pwinput
 from dotenv import load_dotenv
 from smartcard.System import readers
-from playwright.sync_api import Page, TimeoutError
+from playwright.sync_api import BrowserContext, Page, TimeoutError
 
 class ChtSsoLogin:
     """
@@ -14,6 +14,12 @@ class ChtSsoLogin:
         login.ensure_login(page, "https://masis.cht.com.tw/masis/Menu.aspx")
     """
 
+    # Stylesheets are kept: the same page is reused for IRMAS, whose menus
+    # rely on CSS for layout and Playwright's visibility checks.
+    BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+    # Tracking beacons, whatever their resource type
+    BLOCKED_URL_PARTS = ("google-analytics.com", "googletagmanager.com", "doubleclick.net")
+
     def __init__(self):
         load_dotenv()
 
@@ -23,6 +29,9 @@ class ChtSsoLogin:
         self.password = os.getenv("EMS_PPASSWORD") or os.getenv("EMS_PASSWORD")
         self.card_password = os.getenv("EMS_CARD_PASSWORD")
 
+        # Pages / contexts that already have the resource-blocking route installed
+        self._routed = set()
+
     # -----------------------------
     # 🔍 Smart card detection
     # -----------------------------
@@ -45,6 +54,30 @@ class ChtSsoLogin:
             print("❌ No card inserted")
             return False
 
+    # -----------------------------
+    # 🚫 Skip heavy resources
+    # -----------------------------
+    def block_heavy_resources(self, target: Page | BrowserContext):
+        """
+        Abort image/font/media and analytics requests on a page, or on every
+        page of a context (installed once per target).
+        """
+        # A page whose context is already routed would only add a second
+        # handler that falls through on every request
+        if target in self._routed or getattr(target, "context", None) in self._routed:
+            return
+
+        def handle(route):
+            request = route.request
+            if (request.resource_type in self.BLOCKED_RESOURCE_TYPES
+                    or any(part in request.url for part in self.BLOCKED_URL_PARTS)):
+                route.abort()
+            else:
+                route.fallback()
+
+        target.route("**/*", handle)
+        self._routed.add(target)
+
     # -----------------------------
     # 🔎 Detect if current page is SSO login
     # -----------------------------
@@ -104,7 +137,8 @@ class ChtSsoLogin:
         page.fill("input[name='card_pin']", card_password)
         page.click("#verify-button")
 
-        page.wait_for_timeout(10000)
+        # Card verification is done once the PIN form leaves the page
+        page.wait_for_selector("input[name='card_pin']", state="detached", timeout=30000)
         page.wait_for_load_state("networkidle")
 
     # -----------------------------
@@ -169,6 +203,7 @@ class ChtSsoLogin:
             url: Target system URL (IRMAS, MASIS, SPAS, etc.)
         """
         print(f"🌐 Navigating to: {url}")
+        self.block_heavy_resources(page)
         try:
             # Use domcontentloaded instead of load to avoid timeout on slow pages
             page.goto(url, wait_until="domcontentloaded", timeout=60000)
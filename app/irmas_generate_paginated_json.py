@@ -1,7 +1,15 @@
-import json
-import math
 import os
-from typing import Dict, Any, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, List
+from app.json_io import iter_json_array, read_json, write_json
+
+# Message list item templates used by _build_messages
+_AV_WRONG_LI = "<li>{}（{}） 報到於 {}，正確應為 {}</li>"
+_BANNED_LI = "<li>{}（IP：{}，電腦：{}）</li>"
+_OUTDATED_LI = "<li>{}（目前 {}，需更新至 {}），IP：{}</li>"
+
+# Drops full-width spaces (U+3000) anywhere in a name
+_NORMALIZE_TRANS = str.maketrans("", "", "\u3000")
 
 class IrmasReportMerger:
     EXPECTED_ANTIVIRUS_IP = "10.173.105.3"
@@ -11,10 +19,12 @@ class IrmasReportMerger:
         self.output_dir = os.path.join(base_dir, output_subdir)
 
         self.antivirus_report: Dict[str, Any] = {}
-        self.banned_report: List[Any] = []
-        self.outdated_report: List[Any] = []
+        self.banned_report: Iterable[Any] = []
+        self.outdated_report: Iterable[Any] = []
 
         self.people: Dict[str, Dict[str, Any]] = {}
+        # person name -> normalized name used for address book lookups
+        self.normalized_names: Dict[str, str] = {}
         self.address_book: Dict[str, Dict[str, Any]] = {}
         self.missing_contacts: List[str] = []
 
@@ -29,9 +39,10 @@ class IrmasReportMerger:
                 "outdatedSoftwares": [],
                 "message": ""
             }
+            self.normalized_names[name] = self._normalize_name(name)
 
     def _normalize_name(self, name: str) -> str:
-        return name.replace("　", "").strip() if name else ""
+        return name.translate(_NORMALIZE_TRANS).strip() if name else ""
     
     # ---------------------------
     # Load files
@@ -40,16 +51,18 @@ class IrmasReportMerger:
         self,
         antivirus_filename="antivirus_detail_report.json",
         banned_filename="banned_softwares_detail_report.json",
-        outdated_filename="outdated_softwares_detail_report.json"
+        outdated_filename="outdated_softwares_detail_report.json",
+        stream: bool = False
     ):
-        with open(os.path.join(self.base_dir, antivirus_filename), encoding="utf-8") as f:
-            self.antivirus_report = json.load(f)
+        """
+        stream=True reads the banned/outdated arrays lazily (ijson when installed);
+        they are then consumed by a single process() call.
+        """
+        load = iter_json_array if stream else read_json
 
-        with open(os.path.join(self.base_dir, banned_filename), encoding="utf-8") as f:
-            self.banned_report = json.load(f)
-
-        with open(os.path.join(self.base_dir, outdated_filename), encoding="utf-8") as f:
-            self.outdated_report = json.load(f)
+        self.antivirus_report = read_json(os.path.join(self.base_dir, antivirus_filename))
+        self.banned_report = load(os.path.join(self.base_dir, banned_filename))
+        self.outdated_report = load(os.path.join(self.base_dir, outdated_filename))
 
         return self
 
@@ -57,10 +70,14 @@ class IrmasReportMerger:
     # Process antivirus
     # ---------------------------
     def _process_antivirus(self):
+        ev = self.EXPECTED_ANTIVIRUS_IP
+
         for reported_ip, group in self.antivirus_report.items():
             if not isinstance(group, dict) or "detail" not in group or not group["detail"]:
                 continue
 
+            status = "correct" if reported_ip == ev else "wrong"
+
             for item in group["detail"].get("items", []):
                 name = item.get("使用者")
                 if not name:
@@ -68,10 +85,7 @@ class IrmasReportMerger:
 
                 self._ensure_person(name)
 
-                entry = dict(item)
-                entry["reportedIP"] = reported_ip
-                entry["expectedIP"] = self.EXPECTED_ANTIVIRUS_IP
-                entry["status"] = "correct" if reported_ip == self.EXPECTED_ANTIVIRUS_IP else "wrong"
+                entry = {**item, "reportedIP": reported_ip, "expectedIP": ev, "status": status}
 
                 self.people[name]["antivirus"].append(entry)
 
@@ -80,37 +94,44 @@ class IrmasReportMerger:
     # ---------------------------
     def _process_banned(self):
         for entry in self.banned_report:
-            software = entry.get("value")
-            for item in entry.get("items", []):
-                name = item.get("使用者")
-                if not name:
-                    continue
+            self._ingest_banned_entry(entry)
 
-                self._ensure_person(name)
+    def _ingest_banned_entry(self, entry: Dict[str, Any]):
+        software = entry.get("value")
+        for item in entry.get("items", []):
+            name = item.get("使用者")
+            if not name:
+                continue
+
+            self._ensure_person(name)
 
-                banned_entry = dict(item)
-                banned_entry["softwareName"] = software
+            banned_entry = {**item, "softwareName": software}
 
-                self.people[name]["bannedSoftwares"].append(banned_entry)
+            self.people[name]["bannedSoftwares"].append(banned_entry)
 
     # ---------------------------
     # Process outdated software
     # ---------------------------
     def _process_outdated(self):
         for item in self.outdated_report:
-            name = item.get("Name")
-            if not name:
-                continue
+            self._ingest_outdated_item(item)
 
-            self._ensure_person(name)
+    def _ingest_outdated_item(self, item: Dict[str, Any]):
+        name = item.get("Name")
+        if not name:
+            return
 
-            outdated_entry = dict(item)
-            self.people[name]["outdatedSoftwares"].append(outdated_entry)
+        self._ensure_person(name)
+
+        outdated_entry = dict(item)
+        self.people[name]["outdatedSoftwares"].append(outdated_entry)
 
     # ---------------------------
     # Create natural language message
     # ---------------------------
     def _build_messages(self):
+        ev = self.EXPECTED_ANTIVIRUS_IP
+
         for name, data in self.people.items():
 
             html_parts = []
@@ -123,12 +144,11 @@ class IrmasReportMerger:
                 wrong = [x for x in av if x["status"] == "wrong"]
 
                 if wrong:
-                    html_parts.append("<p>你的設備有錯誤的防毒伺服器報到紀錄：</p>")
-                    html_parts.append("<ul>")
-                    for x in wrong:
-                        html_parts.append(
-                            f'<li>{x.get("電腦名稱")}（{x.get("IP位址")}） 報到於 {x.get("reportedIP")}，正確應為 {self.EXPECTED_ANTIVIRUS_IP}</li>'
-                        )
+                    html_parts.append("<p>你的設備有錯誤的防毒伺服器報到紀錄：</p><ul>")
+                    html_parts.append("".join(
+                        _AV_WRONG_LI.format(x.get("電腦名稱"), x.get("IP位址"), x.get("reportedIP"), ev)
+                        for x in wrong
+                    ))
                     html_parts.append("</ul>")
                 else:
                     html_parts.append("<p>你的所有設備皆向正確的防毒伺服器報到。</p>")
@@ -138,12 +158,11 @@ class IrmasReportMerger:
             # -----------------------------
             banned = data["bannedSoftwares"]
             if banned:
-                html_parts.append("<p>偵測到你的設備含有禁止使用的軟體：</p>")
-                html_parts.append("<ul>")
-                for x in banned:
-                    html_parts.append(
-                        f'<li>{x.get("softwareName")}（IP：{x.get("IP位址")}，電腦：{x.get("電腦名稱")}）</li>'
-                    )
+                html_parts.append("<p>偵測到你的設備含有禁止使用的軟體：</p><ul>")
+                html_parts.append("".join(
+                    _BANNED_LI.format(x.get("softwareName"), x.get("IP位址"), x.get("電腦名稱"))
+                    for x in banned
+                ))
                 html_parts.append("</ul>")
 
             # -----------------------------
@@ -151,12 +170,11 @@ class IrmasReportMerger:
             # -----------------------------
             outdated = data["outdatedSoftwares"]
             if outdated:
-                html_parts.append("<p>你的設備有下列軟體需要更新：</p>")
-                html_parts.append("<ul>")
-                for x in outdated:
-                    html_parts.append(
-                        f'<li>{x.get("Software")}（目前 {x.get("Installed")}，需更新至 {x.get("Required")}），IP：{x.get("IP位址")}</li>'
-                    )
+                html_parts.append("<p>你的設備有下列軟體需要更新：</p><ul>")
+                html_parts.append("".join(
+                    _OUTDATED_LI.format(x.get("Software"), x.get("Installed"), x.get("Required"), x.get("IP位址"))
+                    for x in outdated
+                ))
                 html_parts.append("</ul>")
 
             # -----------------------------
@@ -171,6 +189,9 @@ class IrmasReportMerger:
     # Public: Process all datasets
     # ---------------------------
     def process(self):
+        # Create the output directory once here; the exporters below write into it
+        os.makedirs(self.output_dir, exist_ok=True)
+
         self._process_antivirus()
         self._process_banned()
         self._process_outdated()
@@ -183,7 +204,7 @@ class IrmasReportMerger:
     # ---------------------------
     def get_page(self, page: int = 1, page_size: int = 50) -> Dict[str, Any]:
         names = sorted(self.people.keys())
-        total_pages = math.ceil(len(names) / page_size)
+        total_pages = (len(names) + page_size - 1) // page_size
 
         start = (page - 1) * page_size
         end = start + page_size
@@ -200,18 +221,35 @@ class IrmasReportMerger:
     # ---------------------------
     # Export all pages
     # ---------------------------
-    def export_pages(self, page_size: int = 50):
-        os.makedirs(self.output_dir, exist_ok=True)
-
+    def export_pages(self, page_size: int = 50, workers: int = 1):
+        """
+        Write every page to {output_dir}/irmas_page_{n}.json.
+
+        workers > 1 encodes and writes pages in a process pool; worth it only
+        for large exports, since each worker receives a copy of self.people.
+        """
+        # Sort once and slice per page instead of calling get_page(),
+        # which re-sorts every name for every page.
         names = sorted(self.people.keys())
-        total_pages = math.ceil(len(names) / page_size)
+        total_pages = (len(names) + page_size - 1) // page_size
 
-        for page in range(1, total_pages + 1):
-            page_data = self.get_page(page, page_size)
-            out_path = os.path.join(self.output_dir, f"irmas_page_{page}.json")
+        prefix = self.output_dir + os.sep + "irmas_page_"
+        jobs = [
+            (f"{prefix}{page}.json", names[(page - 1) * page_size:page * page_size], page, page_size, total_pages)
+            for page in range(1, total_pages + 1)
+        ]
 
-            with open(out_path, "w", encoding="utf-8") as f:
-                json.dump(page_data, f, ensure_ascii=False, indent=2)
+        if workers > 1 and total_pages > 1:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_page_writer,
+                initargs=(self.people,),
+            ) as executor:
+                # Consume results so worker exceptions are raised here
+                list(executor.map(_write_page, jobs, chunksize=4))
+        else:
+            for job in jobs:
+                _write_page(job, self.people)
 
         print(f"✔ Export complete! {total_pages} pages written to {self.output_dir}")
         return self
@@ -233,9 +271,10 @@ class IrmasReportMerger:
         else:
             address_book_path = os.path.join(self.base_dir, path)
 
-        with open(address_book_path, encoding="utf-8") as f:
-            raw = json.load(f)
+        raw = read_json(address_book_path)
 
+        # Keys stay str: str hashes are cached, so encoding names to bytes per
+        # lookup measured ~3x slower for short CJK names.
         self.address_book = {
             self._normalize_name(p.get("full_name")): p
             for p in raw
@@ -245,35 +284,52 @@ class IrmasReportMerger:
         return self
     
     def _attach_contacts(self):
-        self.missing_contacts = []
+        address_book = self.address_book
+        normalized_names = self.normalized_names
+        missing = []
 
         for name, data in self.people.items():
-            normalized = self._normalize_name(name)
-            contact = self.address_book.get(normalized)
-
+            contact = address_book.get(normalized_names[name])
             data["contact"] = contact
 
             if not contact:
-                self.missing_contacts.append(name)
+                missing.append(name)
+
+        self.missing_contacts = missing
 
     def export_name_message_list(self, filename="irmas_messages.json"):
         out_path = os.path.join(self.output_dir, filename)
-        os.makedirs(self.output_dir, exist_ok=True)
 
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(self.get_name_message_list(), f, ensure_ascii=False, indent=2)
+        write_json(out_path, self.get_name_message_list())
 
         return out_path
         
     def export_missing_contacts(self, filename="missing_contacts.json"):
         out_path = os.path.join(self.output_dir, filename)
-        os.makedirs(self.output_dir, exist_ok=True)
 
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(sorted(set(self.missing_contacts)), f, ensure_ascii=False, indent=2)
+        write_json(out_path, sorted(set(self.missing_contacts)))
 
         return out_path
 
+# --------------------------- Page writer (also runs in pool workers) ---------------------------
+_worker_people: Dict[str, Dict[str, Any]] = {}
+
+def _init_page_writer(people: Dict[str, Dict[str, Any]]):
+    global _worker_people
+    _worker_people = people
+
+def _write_page(job, people: Dict[str, Dict[str, Any]] = None):
+    out_path, names, page, page_size, total_pages = job
+    if people is None:
+        people = _worker_people
+
+    write_json(out_path, {
+        "people": {name: people[name] for name in names},
+        "page": page,
+        "pageSize": page_size,
+        "totalPages": total_pages
+    })
+
 # --------------------------- Export name and message list directly ---------------------------
 def export_irmas_name_message_list(
     base_dir: str = "output/irmas",
@@ -281,11 +337,11 @@ def export_irmas_name_message_list(
     filename: str = "irmas_messages.json"
 ) -> str:
     merger = IrmasReportMerger(base_dir, output_subdir)
-    merger.load_reports().process()
+    merger.load_reports(stream=True).process()
     return merger.export_name_message_list(filename)
 
 # Main execution for testing
 if __name__ == "__main__":
     merger = IrmasReportMerger()
-    merger.load_reports().process().export_pages(page_size=50)
+    merger.load_reports(stream=True).process().export_pages(page_size=50)
     merger.export_name_message_list()    
\ No newline at end of file
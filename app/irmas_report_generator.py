@@ -2,6 +2,14 @@ import os
 import json
 import pandas as pd
 from datetime import datetime
+from html import escape
+
+
+def _rows(df: pd.DataFrame):
+    """Yield DataFrame rows as tuples of Python objects, with None for missing cells."""
+    values = df.astype(object).where(df.notna(), None)
+    return values.itertuples(index=False, name=None)
+
 
 class IrmasReportGenerator:
     """
@@ -68,16 +76,24 @@ class IrmasReportGenerator:
         ]
         df_adv_summary = pd.DataFrame(adv_summary_rows)
 
+        # json_normalize appends meta columns last; keep them first like the sheet layout
+        def meta_first(df: pd.DataFrame, meta_cols: list) -> pd.DataFrame:
+            head = [c for c in meta_cols if c in df.columns]
+            return df[head + [c for c in df.columns if c not in head]]
+
         # Antivirus detail (flatten)
-        adv_detail_rows = []
-        for server_ip, info in adv_detail.items():
-            count = info.get("count")
-            detail = info.get("detail") or {}
-            for item in detail.get("items", []):
-                r = {"連線伺服器IP": server_ip, "統計筆數": count}
-                r.update(item)
-                adv_detail_rows.append(r)
-        df_adv_detail = pd.DataFrame(adv_detail_rows)
+        adv_detail_records = [
+            {
+                "server_ip": server_ip,
+                "count": info.get("count"),
+                "items": (info.get("detail") or {}).get("items", []),
+            }
+            for server_ip, info in adv_detail.items()
+        ]
+        df_adv_detail = pd.json_normalize(
+            adv_detail_records, record_path="items", meta=["server_ip", "count"]
+        ).rename(columns={"server_ip": "連線伺服器IP", "count": "統計筆數"})
+        df_adv_detail = meta_first(df_adv_detail, ["連線伺服器IP", "統計筆數"])
 
         # Banned softwares summary
         ban_summary_rows = [
@@ -92,14 +108,14 @@ class IrmasReportGenerator:
         df_ban_summary = pd.DataFrame(ban_summary_rows)
 
         # Banned softwares detail
-        ban_detail_rows = []
-        for entry in ban_detail:
-            sw_name = entry.get("value")
-            for item in entry.get("items", []):
-                r = {"軟體名稱": sw_name}
-                r.update(item)
-                ban_detail_rows.append(r)
-        df_ban_detail = pd.DataFrame(ban_detail_rows)
+        ban_detail_records = [
+            {"value": entry.get("value"), "items": entry.get("items", [])}
+            for entry in ban_detail
+        ]
+        df_ban_detail = pd.json_normalize(
+            ban_detail_records, record_path="items", meta=["value"]
+        ).rename(columns={"value": "軟體名稱"})
+        df_ban_detail = meta_first(df_ban_detail, ["軟體名稱"])
 
         # Outdated softwares detail
         # 直接用原始欄位（IP位址, Name, Software, Installed, Required, Dept...）
@@ -107,18 +123,43 @@ class IrmasReportGenerator:
 
         # ---------- Export Excel ----------
         excel_path = os.path.join(self.output_dir, "irmas_report.xlsx")
-        with pd.ExcelWriter(excel_path, engine="xlsxwriter") as writer:
-            df_adv_summary.to_excel(writer, index=False, sheet_name="Antivirus_Summary")
-            df_adv_detail.to_excel(writer, index=False, sheet_name="Antivirus_Detail")
-            df_ban_summary.to_excel(writer, index=False, sheet_name="BannedSW_Summary")
-            df_ban_detail.to_excel(writer, index=False, sheet_name="BannedSW_Detail")
-            df_out_detail.to_excel(writer, index=False, sheet_name="OutdatedSW_Detail")
+
+        # constant_memory flushes each row to disk once the next row starts, so rows
+        # must be written in order. df.to_excel writes column by column and would
+        # lose cells, hence the row-wise writer below.
+        with pd.ExcelWriter(
+            excel_path,
+            engine="xlsxwriter",
+            engine_kwargs={"options": {"constant_memory": True}},
+        ) as writer:
+            header_format = writer.book.add_format(
+                {"bold": True, "border": 1, "align": "center", "valign": "top"}
+            )
+
+            def write_sheet(df: pd.DataFrame, sheet_name: str):
+                ws = writer.book.add_worksheet(sheet_name)
+                ws.write_row(0, 0, [str(c) for c in df.columns], header_format)
+                for r, row in enumerate(_rows(df), start=1):
+                    ws.write_row(r, 0, row)
+
+            write_sheet(df_adv_summary, "Antivirus_Summary")
+            write_sheet(df_adv_detail, "Antivirus_Detail")
+            write_sheet(df_ban_summary, "BannedSW_Summary")
+            write_sheet(df_ban_detail, "BannedSW_Detail")
+            write_sheet(df_out_detail, "OutdatedSW_Detail")
 
         print(f"✅ Excel 報表已產出：{excel_path}")
 
         # ---------- Export HTML (collapsible + searchable) ----------
+        # Rows are rendered directly rather than through df.to_html's per-cell
+        # formatting pipeline; values are escaped the same way to_html does.
         def make_table(df: pd.DataFrame, table_id: str) -> str:
-            return df.to_html(index=False, border=0, table_id=table_id)
+            head = "".join(f"<th>{escape(str(c))}</th>" for c in df.columns)
+            body = "".join(
+                "<tr>" + "".join(f"<td>{'' if v is None else escape(str(v))}</td>" for v in row) + "</tr>"
+                for row in _rows(df)
+            )
+            return f'<table id="{table_id}"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
 
         adv_summary_html = make_table(df_adv_summary, "table_adv_summary")
         adv_detail_html = make_table(df_adv_detail, "table_adv_detail")
@@ -230,8 +271,9 @@ th {{
 """
 
         html_path = os.path.join(self.output_dir, "irmas_report_searchable.html")
-        with open(html_path, "w", encoding="utf-8") as f:
-            f.write(html)
+        payload = html.encode("utf-8")
+        with open(html_path, "wb") as f:
+            f.write(payload)
 
         print(f"✅ HTML 報表已產出：{html_path}")
 
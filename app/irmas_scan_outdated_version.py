@@ -1,8 +1,17 @@
-import json
-import glob
+import functools
+import hashlib
+import re
+from collections import namedtuple
 from packaging import version
 from app.paths import internal_path
+from app.json_io import read_json, write_json, write_json_array
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 # ---------------------------
 # Load policy config
@@ -10,8 +19,10 @@ import os
 
 POLICY_PATH = internal_path("config/software_policy.json")
 
-with open(POLICY_PATH, "r", encoding="utf-8") as f:
-    policy = json.load(f)
+policy = read_json(POLICY_PATH)
+
+with open(POLICY_PATH, "rb") as _f:
+    POLICY_DIGEST = hashlib.sha1(_f.read()).hexdigest()
 
 
 # ---------------------------
@@ -49,54 +60,347 @@ def matches_rule(software_name: str, rule_name: str, rule: dict) -> bool:
 # Version comparison
 # ---------------------------
 
-def is_outdated(installed_v: str, required_v: str) -> bool:
+# Plain dotted release numbers ("24.09", "1.2.3"), the bulk of the inventory
+_RELEASE_ONLY = re.compile(r"[0-9]+(?:\.[0-9]+)*")
+
+@functools.lru_cache(maxsize=None)
+def _parse(v: str):
+    """
+    Comparable key for v, or None if it is not a valid version (cached per string).
+
+    Plain release numbers become an int tuple without trailing zeros, so
+    "1.0" and "1" compare equal as in packaging; anything else is a Version.
+    """
     try:
-        return version.parse(installed_v) < version.parse(required_v)
+        if _RELEASE_ONLY.fullmatch(v):
+            release = [int(x) for x in v.split(".")]
+            while release and release[-1] == 0:
+                release.pop()
+            return tuple(release)
+        return version.parse(v)
     except Exception:
+        return None
+
+
+def _as_version(key) -> version.Version:
+    if isinstance(key, tuple):
+        return version.Version(".".join(map(str, key)) or "0")
+    return key
+
+
+def _older(installed, required) -> bool:
+    """installed < required for two _parse() keys."""
+    if type(installed) is type(required):
+        return installed < required
+    return _as_version(installed) < _as_version(required)
+
+
+def is_outdated(installed_v: str, required_v: str) -> bool:
+    installed = _parse(installed_v)
+    required = _parse(required_v)
+    if installed is None or required is None:
         return False
+    return _older(installed, required)
+
+
+# ---------------------------
+# Precompiled rules (policy is static)
+# ---------------------------
+
+def _compile_matcher(rule_name: str, rule: dict):
+    """
+    Build matcher(name_lower, name) -> bool for one rule, with its patterns
+    lowered / frozen up front. Returns None for unknown match types.
+    """
+    match_type = rule["match_type"]
+
+    if match_type == "keyword":
+        patterns_lower = tuple(p.lower() for p in rule["match_patterns"])
+        return lambda name_lower, name: any(p in name_lower for p in patterns_lower)
+
+    if match_type == "exact":
+        patterns = frozenset(rule["match_patterns"])
+        return lambda name_lower, name: name in patterns
+
+    if match_type == "version_threshold":
+        return lambda name_lower, name: name == rule_name
+
+    return None
+
+
+def _compile_rules(policy: dict) -> list:
+    """(rule_name, matcher, min_required_version, parsed min_required_version) per rule."""
+    compiled = []
+    for rule_name, rule in policy.items():
+        matcher = _compile_matcher(rule_name, rule)
+        if matcher is None:
+            continue
+        required = rule["min_required_version"]
+        compiled.append((rule_name, matcher, required, _parse(required)))
+    return compiled
+
+
+COMPILED_RULES = _compile_rules(policy)
+
+
+# ---------------------------
+# Rule index: find matching rules in one pass over the name
+# ---------------------------
+
+def _build_rule_index(policy: dict, compiled_rules: list):
+    """
+    Aho–Corasick automaton over every lowered keyword pattern, plus a dict for
+    exact / version_threshold names; values are COMPILED_RULES indices.
+    Returns None when pyahocorasick is not installed.
+    """
+    if ahocorasick is None:
+        return None
+
+    position = {rule_name: i for i, (rule_name, *_) in enumerate(compiled_rules)}
+    keyword_hits = {}
+    exact_hits = {}
+    always = set()  # keyword rules with an empty pattern match every name
+
+    for rule_name, rule in policy.items():
+        i = position.get(rule_name)
+        if i is None:
+            continue
+
+        match_type = rule["match_type"]
+        if match_type == "keyword":
+            for pattern in rule["match_patterns"]:
+                pattern = pattern.lower()
+                if pattern:
+                    keyword_hits.setdefault(pattern, set()).add(i)
+                else:
+                    always.add(i)
+        elif match_type == "exact":
+            for pattern in rule["match_patterns"]:
+                exact_hits.setdefault(pattern, set()).add(i)
+        elif match_type == "version_threshold":
+            exact_hits.setdefault(rule_name, set()).add(i)
+
+    automaton = None
+    if keyword_hits:
+        automaton = ahocorasick.Automaton()
+        for pattern, indices in keyword_hits.items():
+            automaton.add_word(pattern, frozenset(indices))
+        automaton.make_automaton()
+
+    return automaton, exact_hits, frozenset(always)
+
+
+_RULE_INDEX = _build_rule_index(policy, COMPILED_RULES)
+
+
+def _build_prefilter(policy: dict):
+    """
+    (keyword regex, exact names) that any matching rule needs; a name hitting
+    neither cannot match, so the per-rule loop is skipped. The regex is a
+    union of the lowered keyword patterns, searched in the lowered name
+    just like the keyword matcher does. Used when pyahocorasick is missing.
+    """
+    keywords = set()
+    exact_names = set()
+
+    for rule_name, rule in policy.items():
+        match_type = rule["match_type"]
+        if match_type == "keyword":
+            keywords.update(p.lower() for p in rule["match_patterns"])
+        elif match_type == "exact":
+            exact_names.update(rule["match_patterns"])
+        elif match_type == "version_threshold":
+            exact_names.add(rule_name)
+
+    union = "|".join(re.escape(p) for p in sorted(keywords))
+    return (re.compile(union) if keywords else None), frozenset(exact_names)
+
+
+_KW_UNION, _EXACT_NAMES = _build_prefilter(policy)
+
+
+def _matching_rules(name_lower: str, name: str) -> list:
+    """COMPILED_RULES entries matching this software name, in policy order."""
+    if _RULE_INDEX is None:
+        if name not in _EXACT_NAMES and (_KW_UNION is None or not _KW_UNION.search(name_lower)):
+            return []
+        return [r for r in COMPILED_RULES if r[1](name_lower, name)]
+
+    automaton, exact_hits, always = _RULE_INDEX
+    hits = set(always)
+    hits.update(exact_hits.get(name, ()))
+    if automaton is not None:
+        for _, indices in automaton.iter(name_lower):
+            hits.update(indices)
+
+    return [COMPILED_RULES[i] for i in sorted(hits)]
 
 
 # ---------------------------
 # Scan software inventory
 # ---------------------------
 
-SOFTWARE_DIR = os.path.join("output", "irmas", "特定軟體清查分群", "*.json")
+SOFTWARE_DIR = os.path.join("output", "irmas", "特定軟體清查分群")
+
+# One outdated install; turned into a JSON object keyed by ROW_KEYS only when saved
+Row = namedtuple("Row", "ip name dept software installed required source")
+ROW_KEYS = ("IP位址", "Name", "Dept", "Software", "Installed", "Required", "SourceFile")
 
-def scan_inventory():
+def _iter_json_files(directory: str):
+    """Lazily yield *.json paths in directory (same matches as glob, without the list)."""
+    try:
+        it = os.scandir(directory)
+    except FileNotFoundError:
+        return
+
+    with it:
+        for entry in it:
+            if entry.name.endswith(".json") and not entry.name.startswith(".") and entry.is_file():
+                yield entry.path
+
+def _scan_one(file: str) -> list:
+    """Rows for every outdated install in one inventory file (also runs in pool workers)."""
+    data = read_json(file)
+    source_file = os.path.basename(file)
     rows = []
 
-    for file in glob.glob(SOFTWARE_DIR):
-        with open(file, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    for software_name, versions_dict in data.items():
+        normalized_name = normalize_name(software_name)
+        normalized_lower = normalized_name.lower()
+
+        matching = _matching_rules(normalized_lower, normalized_name)
+        if not matching:
+            continue
+
+        # Walk and parse the installed versions once, whatever the rule count
+        installed = []
+        for installed_version, user_list in versions_dict.items():
+            if not user_list:
+                continue
+            installed_parsed = _parse(installed_version)
+            if installed_parsed is not None:
+                installed.append((installed_version, user_list, installed_parsed))
+
+        for rule_name, matcher, required, required_parsed in matching:
+            if required_parsed is None:
+                continue
+
+            for installed_version, user_list, installed_parsed in installed:
+
+                if _older(installed_parsed, required_parsed):
+
+                    for u in user_list:
+                        rows.append(Row(
+                            u.get("IP位址"),
+                            u.get("使用者中文姓名"),
+                            u.get("使用者部門三"),
+                            software_name,
+                            installed_version,
+                            required,
+                            source_file
+                        ))
 
-        for software_name, versions_dict in data.items():
-            normalized_name = normalize_name(software_name)
+    return rows
 
-            for rule_name, rule in policy.items():
-                if not matches_rule(normalized_name, rule_name, rule):
-                    continue
 
-                required = rule["min_required_version"]
+def _scan_files(files: list, workers: int):
+    """Yield _scan_one(file) for each file, in order."""
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+            yield from executor.map(_scan_one, files, chunksize=8)
+    else:
+        for file in files:
+            yield _scan_one(file)
 
-                for installed_version, user_list in versions_dict.items():
 
-                    if not user_list:
-                        continue
+# ---------------------------
+# Scan cache: skip inventory files unchanged since the last run
+# ---------------------------
 
-                    if is_outdated(installed_version, required):
+SCAN_CACHE_DIR = os.path.join("output", "irmas", ".cache")
+SCAN_INDEX_PATH = os.path.join(SCAN_CACHE_DIR, "scan_index.json")
+SCAN_CACHE_VERSION = 2
 
-                        for u in user_list:
-                            rows.append({
-                                "IP位址": u.get("IP位址"),
-                                "Name": u.get("使用者中文姓名"),
-                                "Dept": u.get("使用者部門三"),
-                                "Software": software_name,
-                                "Installed": installed_version,
-                                "Required": required,
-                                "SourceFile": os.path.basename(file)
-                            })
+def _file_key(file: str) -> list:
+    st = os.stat(file)
+    return [st.st_mtime_ns, st.st_size]
 
-    return rows
+def _rows_path(file: str) -> str:
+    """Sidecar holding the cached rows of one inventory file."""
+    return os.path.join(SCAN_CACHE_DIR, os.path.basename(file) + ".rows.json")
+
+def _write_atomic(path: str, obj):
+    tmp_path = path + ".tmp"
+    write_json(tmp_path, obj)
+    os.replace(tmp_path, path)
+
+def _load_scan_index() -> dict:
+    """file path -> [mtime_ns, size] of its cached rows; empty if the policy changed."""
+    try:
+        index = read_json(SCAN_INDEX_PATH)
+    except (OSError, ValueError):
+        return {}
+
+    if index.get("version") != SCAN_CACHE_VERSION or index.get("policy") != POLICY_DIGEST:
+        return {}
+    return index.get("files", {})
+
+def _save_scan_index(files: dict):
+    _write_atomic(SCAN_INDEX_PATH, {"version": SCAN_CACHE_VERSION, "policy": POLICY_DIGEST, "files": files})
+
+
+def scan_inventory(workers: int = 1, use_cache: bool = True):
+    """
+    Yield a Row for every outdated install, file by file.
+
+    workers > 1 decodes and matches files in a process pool; worth it only
+    for large inventories, since each worker re-imports this module (and,
+    on Windows / frozen builds, the entry script).
+    With use_cache, files whose mtime/size match the last run (under the
+    same policy) replay their rows from .cache/<name>.rows.json instead of
+    being scanned; only one file's rows are held at a time.
+    """
+    files = list(_iter_json_files(SOFTWARE_DIR))
+
+    if not use_cache:
+        for file_rows in _scan_files(files, workers):
+            yield from file_rows
+        return
+
+    cached = _load_scan_index()
+    keys = {file: _file_key(file) for file in files}
+    stale = [
+        file for file in files
+        if cached.get(file) != keys[file] or not os.path.exists(_rows_path(file))
+    ]
+
+    if stale:
+        os.makedirs(SCAN_CACHE_DIR, exist_ok=True)
+
+    scanned = _scan_files(stale, workers)
+    stale_set = set(stale)
+
+    try:
+        for file in files:
+            if file in stale_set:
+                file_rows = next(scanned)
+                _write_atomic(_rows_path(file), [list(r) for r in file_rows])
+            else:
+                file_rows = [Row(*r) for r in read_json(_rows_path(file))]
+
+            yield from file_rows
+    finally:
+        scanned.close()
+
+    # Sidecars of files that are gone
+    for file in cached.keys() - keys.keys():
+        try:
+            os.remove(_rows_path(file))
+        except OSError:
+            pass
+
+    if stale or cached.keys() != keys.keys():
+        _save_scan_index(keys)
 
 
 # ---------------------------
@@ -112,35 +416,44 @@ json_path = os.path.join(OUTPUT_DIR, "outdated_softwares_detail_report.json")
 # Main callable function
 # ---------------------------
 
-def run_outdated_scan():
+def _print_row(r: Row):
+    print(f"{r.ip:<15} | "
+          f"{r.name:<10} | "
+          f"{r.dept:<12} | "
+          f"{r.software:<25} | "
+          f"{r.installed:<12} | "
+          f"{r.required}")
+
+
+def _report_records(show_table: bool, workers: int = 1):
+    """JSON objects for the report, echoing each row to the console if asked."""
+    for r in scan_inventory(workers):
+        if show_table:
+            _print_row(r)
+        yield dict(zip(ROW_KEYS, r))
+
+
+def run_outdated_scan(show_table: bool = False, workers: int = 1):
     """
     Runs outdated software scanning based on policy rules
     and generates:
       - outdated_software.json
       - outdated_software.xlsx
-    """
-    rows = scan_inventory()
-
-    print(f"Total outdated records: {len(rows)}\n")
-
-    print(f"{'IP位址':<15} | {'Name':<10} | {'Dept':<12} | "
-          f"{'Software':<25} | {'Installed':<12} | {'Required'}")
-    print("-" * 96)
 
-    for r in rows:
-        print(f"{r['IP位址']:<15} | "
-              f"{r['Name']:<10} | "
-              f"{r['Dept']:<12} | "
-              f"{r['Software']:<25} | "
-              f"{r['Installed']:<12} | "
-              f"{r['Required']}")
+    Rows are streamed to the JSON file as they are found.
+    show_table=True also prints every row to the console; workers is passed
+    to scan_inventory.
+    """
+    if show_table:
+        print(f"{'IP位址':<15} | {'Name':<10} | {'Dept':<12} | "
+              f"{'Software':<25} | {'Installed':<12} | {'Required'}")
+        print("-" * 96)
 
     # Save JSON
-    with open(json_path, "w", encoding="utf-8") as jf:
-        json.dump(rows, jf, ensure_ascii=False, indent=2)
-
+    total = write_json_array(json_path, _report_records(show_table, workers))
 
-    print(f"\nSaved JSON → {json_path}")
+    print(f"\nTotal outdated records: {total}")
+    print(f"Saved JSON → {json_path}")
     print("Outdated version scan completed.")
 
 
@@ -148,4 +461,4 @@ def run_outdated_scan():
 # Allow standalone execution
 # ---------------------------
 if __name__ == "__main__":
-    run_outdated_scan()
+    run_outdated_scan(show_table=True)
@@ -0,0 +1,75 @@
+import json
+import os
+from typing import Any, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def loads(data: bytes) -> Any:
+    """
+    Parse JSON bytes (orjson when available, stdlib json otherwise).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize to indented UTF-8 JSON bytes, keeping non-ASCII text as-is.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+def read_json(path) -> Any:
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+def write_json(path, obj: Any) -> None:
+    with open(path, "wb") as f:
+        f.write(dumps(obj))
+
+def write_json_array(path, items: Iterable[Any]) -> int:
+    """
+    Write items as a top-level JSON array as they are produced, without
+    building the list first. Output matches write_json(path, list(items)).
+    Items go to path + ".tmp", which replaces path only once every item is
+    written; if items raises, the previous file is left as it was.
+    Returns the number of items written.
+    """
+    tmp_path = str(path) + ".tmp"
+    count = 0
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(b"[")
+            for item in items:
+                # Items sit one level deep; JSON strings never hold raw newlines
+                f.write(b",\n  " if count else b"\n  ")
+                f.write(dumps(item).replace(b"\n", b"\n  "))
+                count += 1
+            f.write(b"\n]" if count else b"]")
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    os.replace(tmp_path, path)
+    return count
+
+def iter_json_array(path) -> Iterator[Any]:
+    """
+    Yield the items of a top-level JSON array one at a time.
+    Streams with ijson when installed; otherwise loads the whole file.
+    """
+    try:
+        import ijson
+    except ImportError:
+        yield from read_json(path)
+        return
+
+    with open(path, "rb") as f:
+        yield from ijson.items(f, "item", use_float=True)
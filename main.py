@@ -3,10 +3,13 @@ import re
 import sys
 import json
 import shutil
+import multiprocessing
+from contextlib import ExitStack
 from pathlib import Path
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright, Page
+from playwright.sync_api import sync_playwright, Page, TimeoutError as PlaywrightTimeoutError
 from app.paths import internal_path, external_path
+from app.json_io import read_json, write_json
 from app.irmas_scan_outdated_version import run_outdated_scan
 from app.irmas_generate_paginated_json import IrmasReportMerger
 from app.irmas_report_generator import IrmasReportGenerator
@@ -42,35 +45,117 @@ os.makedirs(CHROMIUM_PROFILE, exist_ok=True)
 if not os.path.exists(CHROMIUM_PATH):
     raise RuntimeError(f"Chromium not found: {CHROMIUM_PATH}")
 
-def run_software_query(page: Page, cat_label: str, values: list[str]):
+# Number of entries in the query form's own criteria list (the Item/Cat
+# selects and any result table are not counted); -1 if there is no form.
+_QUERY_LIST_COUNT = """(() => {
+    const input = document.querySelector("input[name='s101_data1']");
+    const form = input && input.form;
+    if (!form) return -1;
+    return Array.from(form.querySelectorAll("option"))
+        .filter(o => !o.closest("select[name='Item'], select[name='Cat']"))
+        .length;
+})()"""
+QUERY_LIST_COUNT_JS = "() => " + _QUERY_LIST_COUNT
+QUERY_LIST_GREW_JS = "(before) => " + _QUERY_LIST_COUNT + " > before"
+
+def add_query_value(page: Page, value: str, timeout: float):
     """
-    Run a 軟體資料 query with given Cat label and input values
+    Fill s101_data1 and click 新增, then wait until the criteria list gains
+    an entry. timeout is the old fixed sleep, so a list that can't be
+    detected costs no more than before.
     """
-    page.goto("https://irmas.cht.com.tw/90102_00.php")
-    page.wait_for_load_state("networkidle")
+    before = page.evaluate(QUERY_LIST_COUNT_JS)
+    page.fill("input[name='s101_data1']", value)
+    page.click("input[name='s101_button']")
+    try:
+        page.wait_for_function(QUERY_LIST_GREW_JS, arg=before, timeout=timeout)
+    except PlaywrightTimeoutError:
+        pass
+
+def _open_query_form(page: Page):
+    """
+    Open a fresh 主機資訊 (90102_01.php) form, with an empty criteria list.
+    """
+    # Wait only for the element touched next, not for network idle
+    page.goto(irmas_site + "/90102_00.php")
     page.click("a[href='./90102_01.php?SubInfo=11']")
-    page.wait_for_load_state("networkidle")
+    page.wait_for_selector("select[name='Item']")
+    print("Opened 主機資訊 page")
+
+# Text of the selected Item option
+SELECTED_ITEM_JS = """
+() => {
+    const s = document.querySelector("select[name='Item']");
+    return s && s.selectedIndex >= 0 ? s.options[s.selectedIndex].text.trim() : null;
+}
+"""
+
+# Tag the current Cat list before changing Item ...
+MARK_CAT_STALE_JS = """
+() => {
+    const s = document.querySelector("select[name='Cat']");
+    if (s) {
+        s.dataset.staleOptions = Array.from(s.options, o => o.value).join("\\n");
+    }
+}
+"""
+
+# ... then wait for a Cat list that is new or changed and offers the label
+CAT_REPOPULATED_JS = """
+(label) => {
+    const s = document.querySelector("select[name='Cat']");
+    if (!s) return false;
+    const stale = s.dataset.staleOptions;
+    const current = Array.from(s.options, o => o.value).join("\\n");
+    return (stale === undefined || stale !== current) &&
+        Array.from(s.options).some(o => o.text.trim() === label);
+}
+"""
+
+def _do_query(page: Page, cat_label: str, values: list[str], form_ready: bool = False):
+    """
+    Run a 軟體資料 query with given Cat label and input values.
+
+    form_ready=True means the caller has just opened a fresh form; otherwise
+    a new one is opened so no criteria from an earlier query carry over.
+    """
+    if not form_ready:
+        _open_query_form(page)
 
-    print("Selecting 軟體資料...")
-    page.select_option("select[name='Item']", label="軟體資料")
-    page.wait_for_load_state("networkidle")
-    page.wait_for_timeout(300)
+    # Item may already be 軟體資料 (e.g. as the form's default); re-selecting
+    # it would not repopulate Cat, so there would be nothing to wait for
+    if page.evaluate(SELECTED_ITEM_JS) != "軟體資料":
+        print("Selecting 軟體資料...")
+        page.evaluate(MARK_CAT_STALE_JS)
+        page.select_option("select[name='Item']", label="軟體資料")
+        page.wait_for_function(CAT_REPOPULATED_JS, arg=cat_label)
 
     print(f"Selecting Cat: {cat_label}")
     page.select_option("select[name='Cat']", label=cat_label)
-    page.wait_for_timeout(300)
 
     for value in values:
         print(f"Adding {cat_label}: {value}")
-        page.fill("input[name='s101_data1']", value)
-        page.click("input[name='s101_button']")
-        page.wait_for_timeout(200)
-
-    with page.expect_request_finished(timeout=120000) as finished:
+        add_query_value(page, value, timeout=200)
+
+    # Only the submit's document request counts; any other request finishing
+    # first would leave the pre-submit page in place for extract_table
+    with page.expect_request_finished(
+        lambda request: request.is_navigation_request() and request.frame == page.main_frame,
+        timeout=120000,
+    ) as finished:
         page.locator("input[name='submit_data']").click(no_wait_after=True)
 
     print(f"{cat_label} request completed:", finished.value.url)
-    page.wait_for_load_state("networkidle")
+    # The result table is server-rendered, so the new document's DOM is all
+    # extract_table needs
+    page.wait_for_load_state("domcontentloaded")
+
+# Role to pick on the 0_auth2.php role selection page
+ROLE_SCOPE = "/中華電信公司/新北營運處"
+ROLE_BUTTON_XPATH = (
+    f"xpath=//tr[td[3][contains(normalize-space(.), '{ROLE_SCOPE}')]]"
+    "/td[1]//input[@type='button']"
+)
 
 def check_and_handle_role_selection(page: Page):
     """
@@ -82,31 +167,16 @@ def check_and_handle_role_selection(page: Page):
     
     if "0_auth2.php" in page.url or "具備多重管理身分" in page.content():
         print("✓ Detected role selection page, handling...")
-        # Find the row where 管轄範圍 contains "/中華電信公司/新北營運處"
-        rows = page.locator("table tr")
-        row_count = rows.count()
-        
-        button_clicked = False
-        for i in range(row_count):
-            row = rows.nth(i)
-            cells = row.locator("td")
-            
-            # Check if row has 3 cells (button, 功能權限, 管轄範圍)
-            if cells.count() >= 3:
-                scope_cell = cells.nth(2)  # Third column is 管轄範圍
-                scope_text = scope_cell.inner_text().strip()
-                
-                if "/中華電信公司/新北營運處" in scope_text:
-                    print(f"Found matching role with scope: {scope_text}")
-                    button = cells.nth(0).locator("input[type='button']")
-                    if button.count() > 0:
-                        button.click()
-                        print("✓ Clicked role selection button")
-                        page.wait_for_load_state("networkidle")
-                        button_clicked = True
-                        break
-        
-        if not button_clicked:
+        # One query for the first row whose 管轄範圍 (3rd column) contains the
+        # scope, returning the button in its 1st column
+        button = page.locator(ROLE_BUTTON_XPATH).first
+
+        if button.count() > 0:
+            print(f"Found matching role with scope: {ROLE_SCOPE}")
+            button.click()
+            print("✓ Clicked role selection button")
+            page.wait_for_load_state("domcontentloaded")
+        else:
             print("⚠ Role selection button for '新北營運處' not found, continuing...")
         
         return True  # Role selection was handled
@@ -127,13 +197,86 @@ def select_irmas_role(page: Page):
     page.click("input[value='角色切換']")
     print("Clicked 角色切換")
 
-    page.wait_for_load_state("networkidle")
+    # check_and_handle_role_selection reads the role table from the DOM
+    page.wait_for_load_state("domcontentloaded")
 
     # ---------------------------------------------
     # 2️⃣ Check if redirected to role selection page
     # ---------------------------------------------
     check_and_handle_role_selection(page)
 
+# -----------------------------
+# Detail pages
+# -----------------------------
+DETAIL_TABS = 4
+
+def _extract_loaded_detail(page: Page, url: str, value: str):
+    """
+    Extract the device table from a detail page whose DOM has just loaded.
+    If IRMAS bounced to role selection (0_auth2.php), pick the role,
+    reload the page and extract again.
+    """
+    # Quick check: does this page have the data table?
+    has_table = page.locator("body > table").count() > 0
+
+    if has_table:
+        # Table exists, try to extract immediately before any redirect
+        print("[DEBUG] Table found, extracting immediately...")
+        try:
+            detail_json = extract_detail_table(page, value)
+
+            # Check if we got redirected during extraction
+            if "0_auth2.php" in page.url:
+                print("[DEBUG] Silently redirected to role selection during extraction")
+                raise Exception("Redirected to role selection")
+
+            return detail_json
+        except Exception as e:
+            # Redirect happened during extraction
+            print(f"[DEBUG] Redirect occurred during extraction: {e}")
+    else:
+        # No table yet, might redirect to role selection
+        print("[DEBUG] No table found, checking for redirect...")
+
+    role_handled = check_and_handle_role_selection(page)
+
+    if role_handled:
+        print(f"Re-navigating to {url} after role selection...")
+        page.goto(url)
+        page.wait_for_load_state("domcontentloaded")
+
+    return extract_detail_table(page, value)
+
+def fetch_detail_pages(page: Page, jobs: list[tuple[str, str]], tabs: int = DETAIL_TABS) -> list:
+    """
+    Extract the detail table for each (url, value) job, in job order.
+
+    The sync API must stay on one thread, so instead of a thread pool the
+    pages are loaded `tabs` at a time: every tab starts navigating first,
+    then each one is read once its DOMContentLoaded has arrived.
+    """
+    pool = [page] + [page.context.new_page() for _ in range(min(tabs, len(jobs)) - 1)]
+    details = []
+
+    try:
+        for start in range(0, len(jobs), len(pool)):
+            batch = list(zip(pool, jobs[start:start + len(pool)]))
+
+            # Leaving the stack waits for every tab's DOMContentLoaded
+            with ExitStack() as stack:
+                for tab, (url, value) in batch:
+                    print(f"Fetching detail page for {value}: {url}")
+                    stack.enter_context(tab.expect_event("domcontentloaded"))
+                    tab.evaluate("url => { location.href = url; }", url)
+
+            for tab, (url, value) in batch:
+                details.append(_extract_loaded_detail(tab, url, value))
+    finally:
+        for tab in pool[1:]:
+            tab.close()
+
+    return details
+
 def banned_software_finding_procedure(page: Page):
     # ---------------------------------------------
     # 1️⃣ Click the "電腦資料" menu item
@@ -142,26 +285,21 @@ def banned_software_finding_procedure(page: Page):
     page.click("font#STMtubtehr_0__5___TX", timeout=60000)
     print("Clicked 電腦資料")
 
-    page.goto("https://irmas.cht.com.tw/90102_00.php")
-    page.wait_for_load_state("networkidle")
-
-    # Click 主機資訊 link
-    page.click("a[href='./90102_01.php?SubInfo=11']")
-    page.wait_for_load_state("networkidle")
-    print("Opened 主機資訊 page")
+    _open_query_form(page)
 
     # Load config
     banned_software_config_path = internal_path("config/banned_software.json")
-    with open(banned_software_config_path, "r", encoding="utf-8") as f:
-        banned_softwares = json.load(f)
+    banned_softwares = read_json(banned_software_config_path)
 
     # ---------------------------------------------
     # 5️⃣ Search by 名稱
     # ---------------------------------------------
-    run_software_query(
+    # The form opened above is still fresh; 廠商 below opens its own
+    _do_query(
         page,
         cat_label="名稱",
-        values=banned_softwares["keywords"]
+        values=banned_softwares["keywords"],
+        form_ready=True
     )
 
     results_by_name = extract_table(page)
@@ -169,7 +307,7 @@ def banned_software_finding_procedure(page: Page):
     # ---------------------------------------------
     # 6️⃣ Search by 廠商
     # ---------------------------------------------
-    run_software_query(
+    _do_query(
         page,
         cat_label="廠商",
         values=banned_softwares["manufacturers"]
@@ -194,101 +332,80 @@ def banned_software_finding_procedure(page: Page):
     print(f"Total results after deduplication: {len(results)}")
 
     # Save to JSON
-    with open(os.path.join(IRMAS_OUTPUT_DIR, "banned_softwares_report.json"), "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    write_json(os.path.join(IRMAS_OUTPUT_DIR, "banned_softwares_report.json"), results)
 
+    jobs = []
     for row in results:
         # skip rows that have no detail link
         if "detail_link" not in row:
             print(f"Skipping (no detail link): {row['value']}")
             continue
 
-        url = irmas_site + "/" + row["detail_link"]
-        value = row["value"]
+        jobs.append((irmas_site + "/" + row["detail_link"], row["value"]))
 
-        print(f"Visiting detail page for {value}: {url}")
-        page.goto(url)
-        page.wait_for_load_state("domcontentloaded")  # Fast load, just DOM
-        
-        # Quick check: does this page have the data table?
-        has_table = page.locator("body > table").count() > 0
-        
-        if has_table:
-            # Table exists, try to extract immediately before any redirect
-            print("[DEBUG] Table found, extracting immediately...")
-            try:
-                detail_json = extract_detail_table(page, value)
-                
-                # Check if we got redirected during extraction
-                if "0_auth2.php" in page.url:
-                    print("[DEBUG] Silently redirected to role selection during extraction")
-                    raise Exception("Redirected to role selection")
-                    
-                detail_results.append(detail_json)
-            except Exception as e:
-                # Redirect happened during extraction
-                print(f"[DEBUG] Redirect occurred during extraction: {e}")
-                role_handled = check_and_handle_role_selection(page)
-                
-                if role_handled:
-                    print(f"Re-navigating to {url} after role selection...")
-                    page.goto(url)
-                    page.wait_for_load_state("domcontentloaded")
-                
-                detail_json = extract_detail_table(page, value)
-                detail_results.append(detail_json)
-        else:
-            # No table yet, might redirect to role selection
-            print("[DEBUG] No table found, checking for redirect...")
-            role_handled = check_and_handle_role_selection(page)
-            
-            if role_handled:
-                print(f"Re-navigating to {url} after role selection...")
-                page.goto(url)
-                page.wait_for_load_state("domcontentloaded")
-            
-            detail_json = extract_detail_table(page, value)
-            detail_results.append(detail_json)
+    detail_results.extend(fetch_detail_pages(page, jobs))
 
-    with open(os.path.join(IRMAS_OUTPUT_DIR, "banned_softwares_detail_report.json"), "w", encoding="utf-8") as f:
-        json.dump(detail_results, f, ensure_ascii=False, indent=2)
-        page.wait_for_timeout(800)
+    write_json(os.path.join(IRMAS_OUTPUT_DIR, "banned_softwares_detail_report.json"), detail_results)
     
     # Ensure we're back on a valid IRMAS page before exiting
     print("[DEBUG] Returning to IRMAS homepage...")
     page.goto(irmas_site)
-    page.wait_for_load_state("networkidle")
     check_and_handle_role_selection(page)
 
 # -----------------------------
 # Table Extraction Function
 # -----------------------------
+# Each extractor reads its whole table in one page.evaluate round-trip instead
+# of a CDP call per cell; stripping and parsing stay in Python.
+
+# Summary tables: "<label>：<value>" | count (optionally an <a onclick> link)
+SUMMARY_ROWS_JS = """
+(selector) => Array.from(document.querySelectorAll(selector)).map(tr => {
+    const tds = tr.querySelectorAll("td");
+    const link = tds.length > 1 ? tds[1].querySelector("a") : null;
+    return {
+        cells: tds.length,
+        raw: tds.length ? tds[0].innerText : null,
+        countText: link ? link.innerText : (tds.length > 1 ? tds[1].innerText : null),
+        onclick: link ? link.getAttribute("onclick") : null,
+    };
+})
+"""
+
+# Device detail tables (90102_03.php): per-row cell texts, OS cell HTML, IP link
+DETAIL_ROWS_JS = """
+(selector) => Array.from(document.querySelectorAll(selector)).map(tr => {
+    const tds = Array.from(tr.querySelectorAll("td"));
+    const link = tds.length ? tds[0].querySelector("a[onclick]") : null;
+    return {
+        firstClass: tds.length ? tds[0].getAttribute("class") : null,
+        texts: tds.map(td => td.innerText),
+        osHtml: tds.length > 4 ? tds[4].innerHTML : null,
+        onclick: link ? link.getAttribute("onclick") : null,
+    };
+})
+"""
+
 def extract_table(page: Page):
-    table = page.locator("div#container table")
-    rows = table.locator("tr")
-    row_count = rows.count()
+    rows = page.evaluate(SUMMARY_ROWS_JS, "div#container table tr")
 
     data = []
 
-    for i in range(row_count):
-        cells = rows.nth(i).locator("td")
-        if cells.count() == 0:
+    for row in rows:
+        if row["cells"] == 0:
             continue  # skip headers
 
-        raw_text = cells.nth(0).inner_text().strip()
+        raw_text = row["raw"].strip()
         if "：" in raw_text:
             label, value = raw_text.split("：", 1)
         else:
             continue
 
-        count_cell = cells.nth(1)
-        link_el = count_cell.locator("a")
+        count = int(row["countText"].strip())
 
         # Count > 0 → include detail_link
-        if link_el.count() > 0:
-            count = int(link_el.inner_text().strip())
-            onclick = link_el.get_attribute("onclick")
-            link = onclick.split("'")[1]
+        if row["onclick"] is not None:
+            link = row["onclick"].split("'")[1]
 
             data.append({
                 "label": label,
@@ -299,7 +416,6 @@ def extract_table(page: Page):
 
         # Count = 0 → do NOT include detail_link key
         else:
-            count = int(count_cell.inner_text().strip())
             data.append({
                 "label": label,
                 "value": value,
@@ -308,6 +424,13 @@ def extract_table(page: Page):
 
     return data
 
+def _find_header_index(rows) -> int | None:
+    """Index of the first row whose first <td> is the col_title header."""
+    for i, row in enumerate(rows):
+        if row["texts"] and row["firstClass"] == "col_title":
+            return i
+    return None
+
 def extract_detail_table(page: Page, value_name: str):
     """
     Extract device table from 90102_03.php?ArgVal=xxxx
@@ -317,9 +440,7 @@ def extract_detail_table(page: Page, value_name: str):
     # Wait until page has at least one table
     page.wait_for_selector("body > table")
 
-    table = page.locator("body > table")
-    rows = table.locator("tr")
-    row_count = rows.count()
+    rows = page.evaluate(DETAIL_ROWS_JS, "body > table tr")
 
     result = {
         "value": value_name,
@@ -327,44 +448,31 @@ def extract_detail_table(page: Page, value_name: str):
     }
 
     # Find the header row (col_title)
-    header_index = None
-    for i in range(row_count):
-        cells = rows.nth(i).locator("td")
-        if cells.count() == 0:
-            continue
-        if cells.nth(0).get_attribute("class") == "col_title":
-            header_index = i
-            break
+    header_index = _find_header_index(rows)
 
     if header_index is None:
         print("⚠️ No column header found!")
         return result
 
     # Data begins from header_index + 1
-    for i in range(header_index + 1, row_count):
-        cells = rows.nth(i).locator("td")
+    for row in rows[header_index + 1:]:
+        texts = row["texts"]
 
-        if cells.count() < 6:
+        if len(texts) < 6:
             continue
 
         # IP + link
-        ip_cell = cells.nth(0)
-        ip_text = ip_cell.inner_text().strip()
+        ip_text = texts[0].strip()
 
-        link_el = ip_cell.locator("a[onclick]")
-        pc_detail_link = None
-        if link_el.count() > 0:
-            onclick = link_el.get_attribute("onclick")
-            if onclick:
-                pc_detail_link = onclick.split("'")[1]
+        onclick = row["onclick"]
+        pc_detail_link = onclick.split("'")[1] if onclick else None
 
         # OS + 場域名稱
-        os_html = cells.nth(4).inner_html().strip()
+        os_html = row["osHtml"].strip()
         os_parts = [x.strip() for x in os_html.split("<br>")]
         作業系統 = os_parts[0]
         場域名稱 = os_parts[1] if len(os_parts) > 1 else ""
 
-        ip_text = ip_text.strip()
         # Filter out IP addresses starting with 10.28 (not part of the allowed network range)
         if (ip_text.startswith("10.28")):
             print(f"Skipping IP not in allowed range: {ip_text}")
@@ -372,12 +480,12 @@ def extract_detail_table(page: Page, value_name: str):
 
         item = {
             "IP位址": ip_text,
-            "電腦名稱": cells.nth(1).inner_text().strip(),
-            "資產ID": cells.nth(2).inner_text().strip(),
-            "使用者": cells.nth(3).inner_text().strip(),
+            "電腦名稱": texts[1].strip(),
+            "資產ID": texts[2].strip(),
+            "使用者": texts[3].strip(),
             "作業系統": 作業系統,
             "場域名稱": 場域名稱,
-            "更新時間": cells.nth(5).inner_text().strip(),
+            "更新時間": texts[5].strip(),
             "PC明細連結": pc_detail_link
         }
 
@@ -390,7 +498,6 @@ def query_antivirus_server_ip_range(page: Page, start=1, end=12):
     範例: 10.173.105.1 ~ 10.173.105.12 （不含 .3）
     """
     page.goto(irmas_site)
-    page.wait_for_load_state("networkidle")
     
     # Check if we need to handle role selection after navigating to homepage
     check_and_handle_role_selection(page)
@@ -406,22 +513,14 @@ def query_antivirus_server_ip_range(page: Page, start=1, end=12):
     # 3️⃣ Go to 主機資訊頁面
     # ---------------------------------------------
     print("Opening 主機資訊...")
-
-    page.goto(irmas_site + "/90102_00.php")
-    page.wait_for_load_state("networkidle")
-
-    # Click 主機資訊 link
-    page.click("a[href='./90102_01.php?SubInfo=11']")
-    page.wait_for_load_state("networkidle")
-    print("Opened 主機資訊 page")
+    _open_query_form(page)
 
     print("Selecting 防毒軟體資料 ...")
     page.select_option("select[name='Item']", label="防毒軟體資料")
-    page.wait_for_timeout(300)
+    page.wait_for_selector("select[name='Cat'] option[value='1101405']", state="attached")
 
     print("Selecting 連線伺服器IP ...")
     page.select_option("select[name='Cat']", value="1101405")
-    page.wait_for_timeout(300)
 
     # Generate IPs but EXCLUDE .3
     ips = [
@@ -433,16 +532,16 @@ def query_antivirus_server_ip_range(page: Page, start=1, end=12):
     print("Adding IPs:")
     for ip in ips:
         print(" -", ip)
-        page.fill("input[name='s101_data1']", ip)
-        page.click("input[name='s101_button']")  # 新增
-        page.wait_for_timeout(150)
+        add_query_value(page, ip, timeout=150)  # 新增
 
     print("Submitting query...")
     page.click("input[name='submit_data']")
-    page.wait_for_load_state("networkidle")
+    page.wait_for_load_state("domcontentloaded")
     antivirus_summary = extract_antivirus_summary(page)
 
     details = {}
+    jobs = []
+    entries = []
 
     for row in antivirus_summary:
         value = row["value"]
@@ -453,56 +552,14 @@ def query_antivirus_server_ip_range(page: Page, start=1, end=12):
         if "detail_link" not in row:
             continue
 
-        url = irmas_site + "/" + row["detail_link"]
-        print(f"Fetching detail page: {url}")
+        jobs.append((irmas_site + "/" + row["detail_link"], value))
+        entries.append(details[value])
 
-        page.goto(url)
-        page.wait_for_load_state("domcontentloaded")  # Fast load, just DOM
-        
-        # Quick check: does this page have the data table?
-        has_table = page.locator("body > table").count() > 0
-        
-        if has_table:
-            # Table exists, try to extract immediately before any redirect
-            print("[DEBUG] Table found, extracting immediately...")
-            try:
-                detail_json = extract_detail_table(page, value)
-                
-                # Check if we got redirected during extraction
-                if "0_auth2.php" in page.url:
-                    print("[DEBUG] Silently redirected to role selection during extraction")
-                    raise Exception("Redirected to role selection")
-                    
-                details[value]["detail"] = detail_json
-            except Exception as e:
-                # Redirect happened during extraction
-                print(f"[DEBUG] Redirect occurred during extraction: {e}")
-                role_handled = check_and_handle_role_selection(page)
-                
-                if role_handled:
-                    print(f"Re-navigating to {url} after role selection...")
-                    page.goto(url)
-                    page.wait_for_load_state("domcontentloaded")
-                
-                detail_json = extract_detail_table(page, value)
-                details[value]["detail"] = detail_json
-        else:
-            # No table yet, might redirect to role selection
-            print("[DEBUG] No table found, checking for redirect...")
-            role_handled = check_and_handle_role_selection(page)
-            
-            if role_handled:
-                print(f"Re-navigating to {url} after role selection...")
-                page.goto(url)
-                page.wait_for_load_state("domcontentloaded")
-            
-            detail_json = extract_detail_table(page, value)
-            details[value]["detail"] = detail_json
+    for entry, detail_json in zip(entries, fetch_detail_pages(page, jobs)):
+        entry["detail"] = detail_json
 
-    with open(os.path.join(IRMAS_OUTPUT_DIR, "antivirus_summary.json"), "w", encoding="utf-8") as f:
-        json.dump(antivirus_summary, f, ensure_ascii=False, indent=2)
-    with open(os.path.join(IRMAS_OUTPUT_DIR, "antivirus_detail_report.json"), "w", encoding="utf-8") as f:
-        json.dump(details, f, ensure_ascii=False, indent=2)
+    write_json(os.path.join(IRMAS_OUTPUT_DIR, "antivirus_summary.json"), antivirus_summary)
+    write_json(os.path.join(IRMAS_OUTPUT_DIR, "antivirus_detail_report.json"), details)
 
     print("Antivirus Server IP query completed.")
 
@@ -516,9 +573,7 @@ def extract_detail_antivirus_table(page: Page, value_name: str):
     # Wait for table to load
     page.wait_for_selector("body > table")
 
-    table = page.locator("body > table")
-    rows = table.locator("tr")
-    row_count = rows.count()
+    rows = page.evaluate(DETAIL_ROWS_JS, "body > table tr")
 
     result = {
         "value": value_name,
@@ -526,36 +581,26 @@ def extract_detail_antivirus_table(page: Page, value_name: str):
     }
 
     # Step 1: locate header row
-    header_index = None
-    for i in range(row_count):
-        cells = rows.nth(i).locator("td")
-        if cells.count() > 0 and cells.nth(0).get_attribute("class") == "col_title":
-            header_index = i
-            break
+    header_index = _find_header_index(rows)
 
     if header_index is None:
         return result  # No data, return empty
 
     # Step 2: iterate data rows
-    for i in range(header_index + 1, row_count):
-        cells = rows.nth(i).locator("td")
-        if cells.count() < 6:
+    for row in rows[header_index + 1:]:
+        texts = row["texts"]
+        if len(texts) < 6:
             continue
 
         # IP + detail link
-        ip_cell = cells.nth(0)
-        ip_text = ip_cell.inner_text().strip()
+        ip_text = texts[0].strip()
 
         # Only match <a onclick=""> (ignore empty <a></a>)
-        link_el = ip_cell.locator("a[onclick]")
-
-        pc_detail_link = None
-        if link_el.count() > 0:
-            onclick = link_el.first.get_attribute("onclick")
-            pc_detail_link = onclick.split("'")[1] if onclick else None
+        onclick = row["onclick"]
+        pc_detail_link = onclick.split("'")[1] if onclick else None
 
         # 作業系統 + 場域名稱
-        os_html = cells.nth(4).inner_html().strip()
+        os_html = row["osHtml"].strip()
         os_parts = [p.strip() for p in os_html.split("<br>")]
 
         作業系統 = os_parts[0].rstrip(".")  # remove trailing dot if exists
@@ -564,12 +609,12 @@ def extract_detail_antivirus_table(page: Page, value_name: str):
         # Build item
         item = {
             "IP位址": ip_text,
-            "電腦名稱": cells.nth(1).inner_text().strip(),
-            "資產ID": cells.nth(2).inner_text().strip(),
-            "使用者": cells.nth(3).inner_text().strip(),
+            "電腦名稱": texts[1].strip(),
+            "資產ID": texts[2].strip(),
+            "使用者": texts[3].strip(),
             "作業系統": 作業系統,
             "場域名稱": 場域名稱,
-            "更新時間": cells.nth(5).inner_text().strip(),
+            "更新時間": texts[5].strip(),
             "PC明細連結": pc_detail_link
         }
 
@@ -585,20 +630,16 @@ def extract_antivirus_summary(page: Page):
 
     page.wait_for_selector("table")
 
-    table = page.locator("table")
-    rows = table.locator("tr")
-    row_count = rows.count()
+    rows = page.evaluate(SUMMARY_ROWS_JS, "table tr")
 
     results = []
 
     # Skip first two rows (header + label)
-    for i in range(2, row_count):
-        cells = rows.nth(i).locator("td")
-
-        if cells.count() < 2:
+    for row in rows[2:]:
+        if row["cells"] < 2:
             continue
 
-        raw_text = cells.nth(0).inner_text().strip()
+        raw_text = row["raw"].strip()
 
         # Expected format: 防毒軟體資料_連線伺服器IP：10.173.105.1
         if "：" in raw_text:
@@ -606,14 +647,11 @@ def extract_antivirus_summary(page: Page):
         else:
             continue
 
-        count_cell = cells.nth(1)
-        link_el = count_cell.locator("a")
+        count = int(row["countText"].strip())
 
         # Case 1: Count > 0 and <a> exists
-        if link_el.count() > 0:
-            count = int(link_el.inner_text().strip())
-            onclick = link_el.get_attribute("onclick")
-            detail = onclick.split("'")[1]
+        if row["onclick"] is not None:
+            detail = row["onclick"].split("'")[1]
 
             results.append({
                 "value": value,
@@ -623,7 +661,6 @@ def extract_antivirus_summary(page: Page):
 
         # Case 2: Count = 0 (no link)
         else:
-            count = int(count_cell.inner_text().strip())
             results.append({
                 "value": value,
                 "count": count
@@ -635,6 +672,15 @@ def sanitize_filename(name: str) -> str:
     """Remove illegal characters from filename."""
     return re.sub(r'[\\/*?:"<>|]', "_", name).strip()
 
+# 特定軟體清查: text of the 2nd td.t_text in each ApArr[] checkbox's row
+AUDIT_SOFTWARE_NAMES_JS = """
+() => Array.from(document.querySelectorAll("input[type='checkbox'][name='ApArr[]']")).map(cb => {
+    const tr = cb.closest("tr");
+    const tds = tr ? tr.querySelectorAll("td.t_text") : [];
+    return tds.length > 1 ? tds[1].innerText : "";
+})
+"""
+
 def audit_specific_software(page: Page):
     page.goto(irmas_site + "/90303_00.php")
 
@@ -658,9 +704,8 @@ def audit_specific_software(page: Page):
     total = checkboxes.count()
 
     print(f"Found {total} rows")
-    # 2) Collect all checkbox + name column elements
-    rows = page.locator("tr")  # all table rows
-    total_rows = rows.count()
+    # Software name per checkbox (2nd t_text cell of its row), read in one round-trip
+    software_names = page.evaluate(AUDIT_SOFTWARE_NAMES_JS)
 
     export_button = page.locator("input[value='匯出Excel']")
 
@@ -670,22 +715,16 @@ def audit_specific_software(page: Page):
     for i in range(total):
         print(f"=== Processing row {i+1}/{total} ===")
 
+        # check() scrolls into view itself; expect_download() is the only wait needed
         cb = checkboxes.nth(i)
-        cb.scroll_into_view_if_needed()
         cb.check()
 
         with page.expect_download() as download_info:
             export_button.click()
 
-        # find the row (<tr>) that contains this checkbox
-        row = cb.locator("xpath=ancestor::tr")
         download = download_info.value
-        # extract software name from 2nd t_text column
-        software_name = row.locator("td.t_text").nth(1).inner_text().strip()
-        software_name = software_name.replace("\u00a0", "")  # remove &nbsp;
+        software_name = software_names[i].strip().replace("\u00a0", "")  # remove &nbsp;
         safe_name = sanitize_filename(software_name)
-        # Extract the software name (2nd <td> with class t_text)
-        safe_name = sanitize_filename(software_name)     
         filename = f"{safe_name}.xls"
         # Add to config map (value always "0")
         software_version_map.setdefault(software_name, {})
@@ -774,13 +813,17 @@ def run(playwright, enable_onedrive_dispatch: bool = True):
         ]
     )
 
+    # Scraping only reads the DOM: skip images, fonts, media and analytics
+    # on every tab, including the extra detail-page tabs
+    login = ChtSsoLogin()
+    login.block_heavy_resources(context)
+
     page = context.new_page()
     
     # ========================================
     # STEP 1: Authenticate with CHT SSO first
     # ========================================
     print("🔐 Logging in to CHT SSO via IRMAS...")
-    login = ChtSsoLogin()
     login.ensure_login(page, irmas_site)
     
     select_irmas_role(page)
@@ -802,7 +845,7 @@ def run(playwright, enable_onedrive_dispatch: bool = True):
     banned_software_finding_procedure(page)
     query_antivirus_server_ip_range(page)    
     merger = IrmasReportMerger(base_dir=IRMAS_OUTPUT_DIR)
-    merger.load_reports()
+    merger.load_reports(stream=True)
     merger.load_address_book("./output/contacts/address_book.json")
     merger.process()
     merger.export_name_message_list("irmas_messages.json")
@@ -823,5 +866,9 @@ def run(playwright, enable_onedrive_dispatch: bool = True):
 # -----------------------------
 # 🚀 Start Playwright
 # -----------------------------
-with sync_playwright() as playwright:
-    run(playwright)
+# Guarded so process-pool workers (spawned on Windows / frozen builds)
+# can import this module without launching the browser again
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    with sync_playwright() as playwright:
+        run(playwright)